@@ -1,16 +1,19 @@
-from flask import Flask, render_template, jsonify, request
+from quart import Quart, render_template, request, send_from_directory, Response
 import bambulabs_api as bl
+import orjson
+import asyncio
+import functools
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
-import threading
 import logging
-import base64
 import sys
-from io import BytesIO
+from operator import itemgetter
+from urllib.parse import quote
 import zipfile
 
-app = Flask(__name__)
+app = Quart(__name__)
 app.config.from_object(Config)
 
 # Setup logging
@@ -19,142 +22,316 @@ logger = logging.getLogger(__name__)
 
 # Global printer instance
 printer = None
-printer_lock = threading.Lock()
+printer_lock = asyncio.Lock()
+
+# Hot-path constants, hoisted so request handlers skip the config proxy
+_FILES_DIR = Config.PRINT_FILES_DIR
+_ALLOWED_EXT = frozenset(Config.ALLOWED_EXTENSIONS)
+# Tuple form for str.endswith, which is a single C-level call per name
+_ALLOWED_SUFFIXES = tuple(_ALLOWED_EXT)
+
+def ojson(obj, status=200):
+    """Build a JSON response with orjson, bypassing jsonify's stdlib encoder"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+
+# Upper bound on a single member extracted from a 3mf, to reject
+# crafted decompression bombs before any read.
+_MAX_3MF_MEMBER_SIZE = 500 * 1024 * 1024
+
+def read_3mf_member(zf: zipfile.ZipFile, member: str) -> bytes:
+    """
+    Read a single member out of an open 3mf without touching the rest
+    of the archive.
+
+    Args:
+        zf (zipfile.ZipFile): open 3mf archive.
+        member (str): name of the member to extract.
+
+    Returns:
+        bytes: the member contents.
+    """
+    info = zf.getinfo(member)
+    if info.file_size > _MAX_3MF_MEMBER_SIZE:
+        raise ValueError(f"3mf member too large: {member} ({info.file_size} bytes)")  # noqa: E501
+    return zf.read(member)
+
+@functools.lru_cache(maxsize=16)
+def _open_3mf(path: str, mtime_ns: int) -> zipfile.ZipFile:
+    """Open a 3mf once per file version and keep the handle.
+
+    Opening a ZIP parses the whole central directory, so the gcode
+    listing and thumbnail extraction share one parsed handle instead of
+    re-opening the archive. Displaced handles are closed when the cache
+    entry is garbage collected.
+    """
+    return zipfile.ZipFile(path)
+
+def open_3mf(path: str) -> zipfile.ZipFile:
+    """Get a (cached) open ZipFile for the given 3mf"""
+    return _open_3mf(path, os.stat(path).st_mtime_ns)
+
+@functools.lru_cache(maxsize=256)
+def _gcode_members(path: str, mtime_ns: int, size: int) -> list[str]:
+    """Parse the gcode member names out of a 3mf; cached per file version"""
+    nl = _open_3mf(path, mtime_ns).namelist()
+    print(nl)
+    return [n for n in nl if n.endswith(".gcode") and n.startswith("Metadata/plate_")]  # noqa: E501
 
 def gcode_files_in_3mf(
         zipfile_path: str) -> list[str]:
     """
     Get the gcodefiles in the 3mf.
 
+    The answer is stable for an unchanged file, so it is memoized on
+    (path, mtime_ns, size) and mutation invalidates naturally.
+
     Args:
         zipfile_path (str): location of the text file.
 
     Returns:
         list[str]: first gcode file, or None if not found
     """
-    zf = zipfile.ZipFile(zipfile_path)
+    st = os.stat(zipfile_path)
+    return _gcode_members(zipfile_path, st.st_mtime_ns, st.st_size)
 
-    nl = zf.namelist()
-    print(nl)
-    return [n for n in nl if n.endswith(".gcode") and n.startswith("Metadata/plate_")]  # noqa: E501
+async def get_printer():
+    """One-shot printer initializer, run eagerly at startup.
 
-def get_printer():
-    """Get or create printer instance"""
+    The old unlocked outer check was a data race; now all callers take
+    the lock and the global is only published after connect() returns,
+    so no reader can observe a half-initialized printer. Request
+    handlers read the module global directly and never pay for the lock.
+    """
     global printer
-    if printer is None:
-        with printer_lock:
-            if printer is None:
-                printer = bl.Printer(
-                    app.config['PRINTER_IP'],
-                    app.config['PRINTER_ACCESS_CODE'],
-                    app.config['PRINTER_SERIAL'],
-                    app.config['CAMERA_ENABLED']
-                )
-                printer.connect()
-                time.sleep(2)  # Allow connection to establish
+    async with printer_lock:
+        if printer is None:
+            p = bl.Printer(
+                app.config['PRINTER_IP'],
+                app.config['PRINTER_ACCESS_CODE'],
+                app.config['PRINTER_SERIAL'],
+                app.config['CAMERA_ENABLED']
+            )
+            await asyncio.to_thread(p.connect)
+            # Wait on the real readiness signal (first MQTT push
+            # received) instead of a fixed 2 s stall, with the old
+            # 2 s as a ceiling.
+            deadline = time.monotonic() + 2.0
+            while not p.mqtt_client_ready():
+                if time.monotonic() >= deadline:
+                    logger.warning("Printer not ready after connect; continuing anyway")
+                    break
+                await asyncio.sleep(0.02)
+            printer = p
     return printer
 
+# Directory listing cache: (dir mtime_ns, built timestamp, file list).
+# The listing is rebuilt when the directory mtime changes or the TTL lapses,
+# so the kiosk refresh loop stops re-reading every file each GET /.
+_LISTING_CACHE = {'mtime_ns': None, 'built': 0.0, 'files': None, 'names': frozenset()}
+_LISTING_TTL = 5.0
+
+def listed_file_names():
+    """Set of printable file names, backed by the listing cache"""
+    get_available_files()
+    return _LISTING_CACHE['names']
+
 def get_available_files():
     """Get list of available print files"""
-    files_dir = app.config['PRINT_FILES_DIR']
+    files_dir = _FILES_DIR
     if not os.path.exists(files_dir):
         os.makedirs(files_dir)
         return []
-    
+
+    mtime_ns = os.stat(files_dir).st_mtime_ns
+    cache = _LISTING_CACHE
+    if (cache['files'] is not None
+            and cache['mtime_ns'] == mtime_ns
+            and time.monotonic() - cache['built'] < _LISTING_TTL):
+        return cache['files']
+
     files = []
-    for filename in os.listdir(files_dir):
-        ext = os.path.splitext(filename)[1].lower()
-
-        if ext in app.config['ALLOWED_EXTENSIONS']:
-            filepath = os.path.join(files_dir, filename)
-            basename, _ = os.path.splitext(filename)
-
-            # Parse basename: extract everything before "_Logo" and replace underscores with spaces
-            if "_Logo" in basename:
-                display_name = basename.split("_Logo")[0]
-            else:
-                display_name = basename
-            display_name = display_name.replace("_", " ")
-
-            with open(filepath, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+    # os.scandir gives name/path/stat from a single directory read instead
+    # of a listdir plus an extra stat syscall per file.
+    splitext = os.path.splitext
+    with os.scandir(files_dir) as it:
+        for entry in it:
+            # endswith with a tuple replaces splitext + lower + set
+            # membership with one C-level check
+            if entry.name.lower().endswith(_ALLOWED_SUFFIXES) and entry.is_file():
+                basename, _ = splitext(entry.name)
+
+                # Parse basename: extract everything before "_Logo" and replace underscores with spaces
+                if "_Logo" in basename:
+                    display_name = basename.split("_Logo")[0]
+                else:
+                    display_name = basename
+                display_name = display_name.replace("_", " ")
+
                 files.append({
                     'name': basename + ".3mf",
                     'display_name': display_name,
-                    'image_data': encoded_string
+                    'thumbnail_url': '/thumb/' + quote(entry.name)
                 })
-    
-    return sorted(files, key=lambda x: x['name'])
 
-@app.route('/')
-def index():
-    """Main kiosk interface"""
-    # files = get_available_files()
-    # return render_template('index.html', 
-    #                      files=files, 
-    #                      ams_slots=app.config['AMS_SLOTS'])
-    """Main kiosk interface"""
-    files = get_available_files()
+    files = sorted(files, key=itemgetter('name'))
+    cache['mtime_ns'] = mtime_ns
+    cache['built'] = time.monotonic()
+    cache['files'] = files
+    cache['names'] = frozenset(f['name'] for f in files)
+    return files
 
-    ams_hub = printer.ams_hub()
+@app.before_serving
+async def startup():
+    """Connect to the printer and widen the thread pool used by to_thread"""
+    # The offloaded bambulabs_api calls all block on printer I/O, so give
+    # the event loop's default executor more headroom than its default cap.
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=64))
+    await get_printer()
+
+@app.route('/thumb/<path:name>')
+async def thumb(name):
+    """Serve a thumbnail image so the browser can cache it"""
+    response = await send_from_directory(_FILES_DIR, name)
+    response.cache_control.max_age = 3600
+    return response
+
+# AMS slot cache: filament rarely changes, so the slot dict built from
+# printer.ams_hub() is reused between page loads instead of issuing a
+# printer read per render.
+_AMS_TTL = 2.0
+_ams_cache = {'t': 0.0, 'v': None}
+
+async def get_ams_slots():
+    """Get the AMS slot dict, rebuilt at most every _AMS_TTL seconds"""
+    cache = _ams_cache
+    if cache['v'] is not None and time.monotonic() - cache['t'] < _AMS_TTL:
+        return cache['v']
+
+    ams_hub = await asyncio.to_thread(printer.ams_hub)
     filament_trays = ams_hub[0].filament_trays
-    AMS_SLOTS = {}
+    ams_slots = {}
 
     for idx, tray in filament_trays.items():
         slot_number = idx + 1
-        AMS_SLOTS[str(slot_number)] = {
+        ams_slots[str(slot_number)] = {
             'name': tray.tray_id_name,
             'color': ("#" + tray.tray_color) if tray.tray_color else '#FFFFFF'  # Default to white if no color provided
         }
-    return render_template('index.html', 
-                         files=files, 
-                         ams_slots=AMS_SLOTS)
+
+    cache['v'] = ams_slots
+    cache['t'] = time.monotonic()
+    return ams_slots
+
+@app.route('/')
+async def index():
+    """Main kiosk interface"""
+    files = get_available_files()
+    ams_slots = await get_ams_slots()
+
+    # ETag derived from what the page is rendered from: a 304 costs no
+    # template render and no body transfer on an unchanged kiosk refresh.
+    etag = str(hash((_LISTING_CACHE['mtime_ns'], orjson.dumps(ams_slots))))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    response = Response(await render_template('index.html',
+                         files=files,
+                         ams_slots=ams_slots))
+    response.set_etag(etag)
+    return response
+
+# Status cache: every kiosk poll within the TTL window reuses the last
+# printer read, and the lock coalesces concurrent misses into one hit.
+_STATUS_TTL = 0.5
+_status_cache = {'t': 0.0, 'v': None}
+_status_lock = asyncio.Lock()
+
+def _status_response(body):
+    """Status response with revalidation headers; unchanged polls get a 304"""
+    payload = orjson.dumps(body)
+    etag = str(hash(payload))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(payload, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'max-age=0, must-revalidate'
+    return response
 
 @app.route('/api/status')
-def get_status():
+async def get_status():
     """Get printer status"""
     try:
-        status = printer.get_state()
-        nozzle_temp = printer.get_nozzle_temperature()
-        time_remaining = printer.get_time()
+        cache = _status_cache
+        if time.monotonic() - cache['t'] < _STATUS_TTL:
+            return _status_response(cache['v'])
 
-        formatted_time_remaining = "{:02d} min.".format(time_remaining)
-        light_state = printer.get_light_state()
-        return jsonify({
-            'success': True,
-            'status': {'print_state': status, 'nozzle_temp': nozzle_temp, 
-                       'time_remaining': formatted_time_remaining, 'light_state': light_state}
-        })
+        async with _status_lock:
+            # Re-check: another poll may have refreshed while we waited
+            if time.monotonic() - cache['t'] < _STATUS_TTL:
+                return _status_response(cache['v'])
+
+            # One snapshot of the push-updated MQTT state instead of four
+            # separate getter calls
+            data = (await asyncio.to_thread(printer.mqtt_dump)).get('print', {})
+
+            status = bl.GcodeState(data.get('gcode_state', -1))
+            nozzle_temp = data.get('nozzle_temper')
+            time_remaining = data.get('mc_remaining_time')
+
+            formatted_time_remaining = "{:02d} min.".format(time_remaining)
+            lights_report = data.get('lights_report', [])
+            light_state = lights_report[0].get('mode', 'unknown') if lights_report else 'unknown'
+            body = {
+                'success': True,
+                'status': {'print_state': status, 'nozzle_temp': nozzle_temp,
+                           'time_remaining': formatted_time_remaining, 'light_state': light_state}
+            }
+            cache['v'] = body
+            cache['t'] = time.monotonic()
+        return _status_response(body)
     except Exception as e:
         logger.error(f"Error getting status: {e}")
-        return jsonify({
+        return ojson({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/api/print', methods=['POST'])
-def start_print():
+async def start_print():
     """Start a print job"""
     try:
-        data = request.json
+        data = await request.get_json()
         filename = data.get('filename')
-        ams_slot = data.get('ams_slot')
-        basename, _ = os.path.splitext(filename)
 
         if not filename:
-            return jsonify({
+            return ojson({
                 'success': False,
                 'error': 'No filename provided'
-            }), 400
-        
-        # # Verify file exists
-        # filepath = os.path.join(app.config['PRINT_FILES_DIR'], filename)
-        # if not os.path.exists(filepath):
-        #     return jsonify({
-        #         'success': False,
-        #         'error': 'File not found'
-        #     }), 404
-                
+            }, 400)
+
+        basename, _ = os.path.splitext(filename)
+
+        # Verify the file is in the cached listing -- a set lookup
+        # instead of a stat syscall per click
+        if os.path.basename(filename) not in listed_file_names():
+            return ojson({
+                'success': False,
+                'error': 'File not found'
+            }, 404)
+
+        try:
+            ams_slot = int(data.get('ams_slot'))
+        except (TypeError, ValueError):
+            return ojson({
+                'success': False,
+                'error': 'Invalid AMS slot'
+            }, 400)
+
         # Start print job
         # Note: You'll need to check the actual API method for printing
         # This is a placeholder - adjust based on actual API capabilities
@@ -164,9 +341,10 @@ def start_print():
         #     (i for i in gcode_files_in_3mf(filepath)), None)
 
         # if gcode_location:
+        #     # upload_file streams from any binary file object, so hand it
+        #     # the open handle instead of buffering the whole 3mf in RAM
         #     with open(filepath, "rb") as file:
-        #         io_file = BytesIO(file.read())
-        #     result = printer.upload_file(io_file, filename)
+        #         result = printer.upload_file(file, filename)
         #     if "226" not in result:
         #         print("Error Uploading File to Printer", file=sys.stdout)
 
@@ -178,64 +356,66 @@ def start_print():
         #     print("No gcode file found in 3mf", file=sys.stdout)
 
         # The actual print command will depend on the API
-        printer.start_print(os.path.basename(filename), 1, True, [ams_slot, -1, -1, -1, -1])
-        
-        return jsonify({
+        await asyncio.to_thread(
+            printer.start_print,
+            os.path.basename(filename), 1, True, [ams_slot, -1, -1, -1, -1])
+
+        return ojson({
             'success': True,
             'message': f'Print started: {basename}'
         })
-        
+
     except Exception as e:
         logger.error(f"Error starting print: {e}")
-        return jsonify({
+        return ojson({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/api/light/<action>')
-def control_light(action):
+async def control_light(action):
     """Control printer light"""
     try:
         if action == 'on':
-            printer.turn_light_on()
+            await asyncio.to_thread(printer.turn_light_on)
         elif action == 'off':
-            printer.turn_light_off()
+            await asyncio.to_thread(printer.turn_light_off)
         else:
-            return jsonify({
+            return ojson({
                 'success': False,
                 'error': 'Invalid action'
-            }), 400
-        
-        return jsonify({
+            }, 400)
+
+        return ojson({
             'success': True,
             'action': action
         })
-        
+
     except Exception as e:
         logger.error(f"Error controlling light: {e}")
-        return jsonify({
+        return ojson({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/api/cancel', methods=['POST'])
-def cancel_print():
+async def cancel_print():
     """Cancel current print job"""
     try:
-        printer.stop_print()
-        
-        return jsonify({
+        await asyncio.to_thread(printer.stop_print)
+
+        return ojson({
             'success': True,
             'message': 'Print cancelled'
         })
-        
+
     except Exception as e:
         logger.error(f"Error cancelling print: {e}")
-        return jsonify({
+        return ojson({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 if __name__ == '__main__':
-    printer = get_printer()
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    # For production serve with: uvicorn app:app --host 0.0.0.0 --port 5000
+    app.run(host='0.0.0.0', port=5000, debug=False)
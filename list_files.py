@@ -1,7 +1,8 @@
 import paho.mqtt.client as mqtt
 import json
+import orjson
 import ssl
-import time
+import threading
 
 # Bambu P2S Configuration
 PRINTER_IP = "192.168.0.157"  # Replace with your printer's IP
@@ -13,45 +14,39 @@ SERIAL_NUMBER = "22E8AJ5B2901941"  # Found on printer or in app
 TOPIC_REQUEST = f"device/{SERIAL_NUMBER}/request"
 TOPIC_REPORT = f"device/{SERIAL_NUMBER}/report"
 
-files_list = []
+# File cache keyed by name, refreshed from every sdcard_list push
+files_by_name = {}
+
+# Persistent client shared across calls; connecting (TLS handshake) is paid once
+_client = None
+_client_lock = threading.Lock()
+_files_event = threading.Event()
 
 def on_connect(client, userdata, flags, rc):
     """Callback when connected to MQTT broker"""
     if rc == 0:
         print("Connected to Bambu P2S")
         client.subscribe(TOPIC_REPORT)
-        
-        # First send pushall to get initial state
-        pushall_request = {
-            "pushing": {
-                "sequence_id": "0",
-                "command": "pushall"
-            }
-        }
-        client.publish(TOPIC_REQUEST, json.dumps(pushall_request))
-        print("Requesting initial state...")
-        
-        # Wait a bit then request files
-        time.sleep(2)
 
-        # Request file list from internal storage
+        # Request file list from internal storage straight away; the
+        # response callback signals _files_event when it lands.
         request_files(client)
     else:
         print(f"Connection failed with code {rc}")
 
 def on_message(client, userdata, msg):
     """Callback when message received"""
+    # Cheap substring screen: the printer pushes telemetry several times a
+    # second and we only care about file list responses, so skip the JSON
+    # parse entirely for everything else.
+    if b'"sdcard_list"' not in msg.payload:
+        return
     try:
-        payload = json.loads(msg.payload.decode())
-        # Check printer state
-        if "print" in payload:
-            if "gcode_state" in payload["print"]:
-                state = payload["print"]["gcode_state"]
-                print(f"Printer state: {state}")
+        payload = orjson.loads(msg.payload)
         # Check if this is a file list response
         if "print" in payload and "sdcard_list" in payload["print"]:
             sdcard_data = payload["print"]["sdcard_list"]
-            
+
             print("\n=== Internal Storage Files ===")
             if isinstance(sdcard_data, list):
                 for file_info in sdcard_data:
@@ -59,80 +54,79 @@ def on_message(client, userdata, msg):
                         filename = file_info.get("name", "Unknown")
                         size = file_info.get("size", 0)
                         print(f"  - {filename} ({size} bytes)")
-                        files_list.append(file_info)
-            
-            print(f"\nTotal files: {len(files_list)}")
-            
-            # Disconnect after receiving files
-            client.disconnect()
-            
-    except json.JSONDecodeError:
+                        files_by_name[filename] = file_info
+
+            print(f"\nTotal files: {len(files_by_name)}")
+
+            # Wake up any caller waiting on a refresh
+            _files_event.set()
+
+    except orjson.JSONDecodeError:
         pass
     except Exception as e:
         print(f"Error processing message: {e}")
 
 def request_files(client):
     """Send request to list files on internal storage"""
-    request = {
-        "pushing": {
-            "sequence_id": "0",
-            "command": "pushall"
-        }
-    }
-    
-    # Alternative specific request for SD card files
     request = {
         "print": {
             "sequence_id": "0",
             "command": "get_file_list"
         }
     }
-    
+
     client.publish(TOPIC_REQUEST, json.dumps(request))
     print("Requesting file list...")
 
-def main():
-    """Main function to connect and list files"""
-    
-    # Create MQTT client
-    client = mqtt.Client(client_id="bambu_file_lister")
-    
-    # Set username and password
-    client.username_pw_set("bblp", ACCESS_CODE)
-    
-    # Configure TLS/SSL (Bambu printers use self-signed certificates)
-    client.tls_set(cert_reqs=ssl.CERT_NONE)
-    client.tls_insecure_set(True)
-    
-    # Set callbacks
-    client.on_connect = on_connect
-    client.on_message = on_message
-    
+def get_client():
+    """Get (or lazily create) the persistent MQTT client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            client = mqtt.Client(client_id="bambu_file_lister")
+
+            # Set username and password
+            client.username_pw_set("bblp", ACCESS_CODE)
+
+            # Configure TLS/SSL (Bambu printers use self-signed certificates)
+            client.tls_set(cert_reqs=ssl.CERT_NONE)
+            client.tls_insecure_set(True)
+
+            # Set callbacks
+            client.on_connect = on_connect
+            client.on_message = on_message
+
+            print(f"Connecting to Bambu P2S at {PRINTER_IP}...")
+            client.connect(PRINTER_IP, PRINTER_PORT, 60)
+            client.loop_start()
+            _client = client
+    return _client
+
+def main(timeout=10.0):
+    """Request a file list refresh and wait for the printer's response"""
     try:
-        # Connect to printer
-        print(f"Connecting to Bambu P2S at {PRINTER_IP}...")
-        client.connect(PRINTER_IP, PRINTER_PORT, 60)
-        
-        # Start loop
-        client.loop_start()
-        
-        # Wait for response (max 10 seconds)
-        time.sleep(10)
-        
-        # Stop loop
-        client.loop_stop()
-        
+        client = get_client()
+
+        _files_event.clear()
+        if client.is_connected():
+            request_files(client)
+
+        # Returns as soon as the sdcard_list push arrives instead of
+        # sleeping a fixed 10 seconds
+        if not _files_event.wait(timeout):
+            print("Timed out waiting for file list")
+
     except Exception as e:
         print(f"Error: {e}")
-    
-    return files_list
+
+    return list(files_by_name.values())
 
 if __name__ == "__main__":
     print("Bambu P2S File Listing Script")
     print("=" * 40)
     files = main()
-    
+
     if files:
         print(f"\n{len(files)} file(s) found on internal storage")
     else:
-        print("\nNo files found or connection failed")
\ No newline at end of file
+        print("\nNo files found or connection failed")
@@ -1,14 +1,421 @@
+import collections
+import itertools
+import selectors
 import socket
 import ssl
 import threading
 import json
+import pickle
 import time
 import hashlib
+import hmac
 from datetime import datetime
 import ipaddress
 from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 import struct
 import random
+import zlib
+import logging
+
+# Error handlers print a one-line message and log the traceback at
+# DEBUG, so rendering stacks costs nothing unless debugging is on
+log = logging.getLogger(__name__)
+
+# orjson serializes straight to bytes in C; the simulator still runs
+# without it, just on the stdlib encoder
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def _json_loads(data):
+        return orjson.loads(data)
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    def _json_loads(data):
+        # stdlib json does not accept memoryviews
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+# Preconstructed big-endian u16 packer; unpack_from avoids both the
+# per-call format parse and the 2-byte slice allocation
+_U16 = struct.Struct(">H")
+
+# One-byte remaining-length encodings (lengths < 128) are by far the most
+# common control packets; serve those from a table
+_VARINT_CACHE = tuple(bytes((i,)) for i in range(128))
+
+
+def _encode_varint(n: int) -> bytes:
+    """Encode an MQTT remaining-length value (variable-byte integer)"""
+    if n < 128:
+        return _VARINT_CACHE[n]
+    out = bytearray()
+    while True:
+        byte = n % 128
+        n //= 128
+        if n > 0:
+            byte |= 0x80
+        out.append(byte)
+        if n == 0:
+            return bytes(out)
+
+def _sendv(sock: socket.socket, buffers) -> None:
+    """Gather-send a sequence of byte pieces.
+
+    Plain sockets go through sendmsg so the kernel gathers the iovecs
+    and no concatenated copy is made. TLS-wrapped sockets don't
+    implement sendmsg, so they fall back to one join + sendall.
+    """
+    try:
+        sent = sock.sendmsg(buffers)
+    except (AttributeError, NotImplementedError):
+        sock.sendall(b"".join(buffers))
+        return
+    total = sum(len(b) for b in buffers)
+    if sent < total:
+        # Short write: flatten the remainder once and push it out
+        rest = memoryview(b"".join(buffers))[sent:]
+        sock.sendall(rest)
+
+
+# Status payloads above this size are worth deflating when compression
+# has been opted into (see BambuP2SSimulator(compress_status=...))
+_COMPRESS_THRESHOLD = 512
+
+
+# Fixed protocol responses, hoisted so control packets reuse one bytes
+# object instead of allocating a bytearray per send
+_MQTT_USERNAME = b"bblp"
+
+_PINGRESP = b"\xd0\x00"
+_PUBLISH_Q0 = b"\x30"
+_PUBLISH_Q1 = b"\x32"
+_CONNACK_OK = b"\x20\x02\x00\x00"
+_CONNACK_BAD = b"\x20\x02\x00\x05"  # 0x05 = not authorized
+_CAMERA_STREAM_HEADER = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+)
+
+
+# Initial-state templates, hoisted out of __init__ so constructing a
+# simulator does not re-parse several hundred dict/list literals.
+# History timestamps are offsets from "now"; _initial_print_history
+# shifts them to fresh wall-clock times per instance.
+_PRINT_HISTORY_TEMPLATE = [
+    {
+        'id': '1',
+        'gcode_file': 'test_print_1.gcode',
+        'subtask_name': 'Test Print 1',
+        'profile_id': '0',
+        'task_id': '1',
+        'weight': 15.5,
+        'length': 3500,
+        'start_time': -7200,
+        'end_time': -3600,
+        'cost_time': 3600,
+        'result': 'success',
+        'reason': 0,
+        'bed_type': 'auto',
+        'nozzle_diameter': 0.4,
+        'filament_used_g': 15.5,
+        'filament_used_mm': 3500,
+        'layers': 100,
+        'thumbnail': '',
+    },
+    {
+        'id': '2',
+        'gcode_file': 'test_print_2.gcode',
+        'subtask_name': 'Test Print 2',
+        'profile_id': '0',
+        'task_id': '2',
+        'weight': 25.3,
+        'length': 5700,
+        'start_time': -14400,
+        'end_time': -10800,
+        'cost_time': 3600,
+        'result': 'success',
+        'reason': 0,
+        'bed_type': 'auto',
+        'nozzle_diameter': 0.4,
+        'filament_used_g': 25.3,
+        'filament_used_mm': 5700,
+        'layers': 150,
+        'thumbnail': '',
+    },
+    {
+        'id': '3',
+        'gcode_file': 'failed_print.gcode',
+        'subtask_name': 'Failed Print',
+        'profile_id': '0',
+        'task_id': '3',
+        'weight': 10.0,
+        'length': 2000,
+        'start_time': -21600,
+        'end_time': -20400,
+        'cost_time': 1200,
+        'result': 'failed',
+        'reason': 16777216,
+        'bed_type': 'auto',
+        'nozzle_diameter': 0.4,
+        'filament_used_g': 5.2,
+        'filament_used_mm': 1100,
+        'layers': 35,
+        'thumbnail': '',
+    }
+]
+
+_STATE_TEMPLATE = {
+    'print_status': 'IDLE',
+    'progress': 0,
+    'remaining_time': 0,
+    'bed_temp': 25.0,
+    'bed_target_temp': 0.0,
+    'nozzle_temp': 25.0,
+    'nozzle_target_temp': 0.0,
+    'chamber_temp': 25.0,
+    'speed_level': 2,
+    'fan_speed': 0,
+    'layer_num': 0,
+    'total_layers': 0,
+    'print_error': 0,
+    'wifi_signal': -45,
+    'led_mode': 'on',
+    'online': True,
+}
+
+# AMS (Automatic Material System) state
+_AMS_TEMPLATE = {
+    "ams": {
+        'ams': [
+            {
+                'id': '0',
+                'humidity': 3,
+                'temp': 25.0,
+                "tray": [
+                    {
+                        "bed_temp": 0,
+                        "bed_temp_type": "0",
+                        "cols": [
+                            "FF0000FF"
+                        ],
+                        "drying_temp": 0,
+                        "drying_time": 0,
+                        "id": "0",
+                        "nozzle_temp_max": 240,
+                        "nozzle_temp_min": 190,
+                        "remain": 0,
+                        "tag_uid": "0000000000000000",
+                        "tray_color": "FF0000FF",
+                        "tray_diameter": 0.00,
+                        "tray_id_name": "",
+                        "tray_info_idx": "GFA00",
+                        "tray_sub_brands": "",
+                        "tray_type": "PLA",
+                        "tray_uuid": "00000000000000000000000000000000",
+                        "tray_weight": 0,
+                        "xcam_info": "000000000000000000000000",
+                        "k": 0.024,
+                        "n": 0.1,
+                        "tray_temp": 240,
+                        "tray_time": 0
+                    },
+                    {
+                        "bed_temp": 0,
+                        "bed_temp_type": "0",
+                        "cols": [
+                            "000000FF"
+                        ],
+                        "drying_temp": 0,
+                        "drying_time": 0,
+                        "id": "1",
+                        "nozzle_temp_max": 240,
+                        "nozzle_temp_min": 190,
+                        "remain": 0,
+                        "tag_uid": "0000000000000000",
+                        "tray_color": "000000FF",
+                        "tray_diameter": 0.00,
+                        "tray_id_name": "",
+                        "tray_info_idx": "GFA00",
+                        "tray_sub_brands": "",
+                        "tray_type": "PLA",
+                        "tray_uuid": "00000000000000000000000000000000",
+                        "tray_weight": 0,
+                        "xcam_info": "000000000000000000000000",
+                        "k": 0.024,
+                        "n": 0.1,
+                        "tray_temp": 240,
+                        "tray_time": 0
+                    },
+                    {
+                        "bed_temp": 0,
+                        "bed_temp_type": "0",
+                        "cols": [
+                            "DFE2E3FF"
+                        ],
+                        "drying_temp": 0,
+                        "drying_time": 0,
+                        "id": "2",
+                        "nozzle_temp_max": 240,
+                        "nozzle_temp_min": 190,
+                        "remain": 0,
+                        "tag_uid": "0000000000000000",
+                        "tray_color": "DFE2E3FF",
+                        "tray_diameter": 0.00,
+                        "tray_id_name": "",
+                        "tray_info_idx": "GFA05",
+                        "tray_sub_brands": "",
+                        "tray_type": "PLA",
+                        "tray_uuid": "00000000000000000000000000000000",
+                        "tray_weight": 0,
+                        "xcam_info": "000000000000000000000000",
+                        "k": 0.024,
+                        "n": 0.1,
+                        "tray_temp": 240,
+                        "tray_time": 0
+                    },
+                    {
+                        "bed_temp": 0,
+                        "bed_temp_type": "0",
+                        "cols": [
+                            "F95959FF"
+                        ],
+                        "drying_temp": 0,
+                        "drying_time": 0,
+                        "id": "3",
+                        "nozzle_temp_max": 240,
+                        "nozzle_temp_min": 190,
+                        "remain": 0,
+                        "tag_uid": "0000000000000000",
+                        "tray_color": "F95959FF",
+                        "tray_diameter": 0.00,
+                        "tray_id_name": "",
+                        "tray_info_idx": "GFL00",
+                        "tray_sub_brands": "",
+                        "tray_type": "PLA",
+                        "tray_uuid": "00000000000000000000000000000000",
+                        "tray_weight": 0,
+                        "xcam_info": "000000000000000000000000",
+                        "k": 0.024,
+                        "n": 0.1,
+                        "tray_temp": 240,
+                        "tray_time": 0
+                    }
+                ]
+            }
+        ],
+        "ams_exist_bits": "1",
+        "insert_flag": True,
+        "power_on_flag": False,
+        "tray_exist_bits": "e",
+        "tray_is_bbl_bits": "e",
+        "tray_now": 255, # 254 if external spool / vt_tray, otherwise is ((ams_id * 4) + tray_id) for current tray (ams 2 tray 2 would be (1*4)+1 = 5)
+        "tray_pre": 255,
+        "tray_read_done_bits": "e",
+        "tray_reading_bits": "0",
+        "tray_tar": 255,
+        "version": 4
+    }
+}
+
+# Pickle round-trips rebuild the nested templates markedly faster than
+# copy.deepcopy
+_HISTORY_PICKLED = pickle.dumps(_PRINT_HISTORY_TEMPLATE)
+_STATE_PICKLED = pickle.dumps(_STATE_TEMPLATE)
+_AMS_PICKLED = pickle.dumps(_AMS_TEMPLATE)
+
+
+def _initial_print_history(now: int) -> list:
+    """Fresh copy of the seeded print history, timestamped relative to now"""
+    history = pickle.loads(_HISTORY_PICKLED)
+    for entry in history:
+        entry['start_time'] += now
+        entry['end_time'] += now
+    return history
+
+
+class _SocketReader:
+    """
+    Buffered socket reader.
+
+    Fills a 32 KiB buffer with bulk recv_into calls and hands out exact
+    slices, so parsing an MQTT packet costs ~1 syscall instead of one
+    recv (a full SSL_read) per header byte.
+    """
+
+    CHUNK_SIZE = 32768
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._chunk = bytearray(self.CHUNK_SIZE)
+        self._buf = bytearray()
+        self._view: Optional[memoryview] = None
+        self._consumed = 0
+
+    def _reclaim(self):
+        # Release the view handed out by the previous readview call; an
+        # exported memoryview would make the bytearray resize below raise
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+            del self._buf[:self._consumed]
+            self._consumed = 0
+
+    def _fill(self, n: int) -> bool:
+        buf = self._buf
+        while len(buf) < n:
+            received = self._sock.recv_into(self._chunk)
+            if not received:
+                return False
+            buf += memoryview(self._chunk)[:received]
+        return True
+
+    def read(self, n: int) -> bytes:
+        """Read exactly n bytes; returns b'' if the peer closes first"""
+        self._reclaim()
+        if not self._fill(n):
+            return b''
+        buf = self._buf
+        result = bytes(buf[:n])
+        del buf[:n]
+        return result
+
+    def read_varint(self) -> int:
+        """Read an MQTT remaining-length value; returns -1 on EOF"""
+        value = 0
+        multiplier = 1
+        while True:
+            byte_data = self.read(1)
+            if not byte_data:
+                return -1
+            byte = byte_data[0]
+            value += (byte & 0x7F) * multiplier
+            if (byte & 0x80) == 0:
+                return value
+            multiplier *= 128
+
+    def readview(self, n: int) -> memoryview:
+        """Read exactly n bytes as a view into the internal buffer.
+
+        Avoids the bytes copy that read() makes; the view is only valid
+        until the next read/readview call. Returns b'' on EOF.
+        """
+        self._reclaim()
+        if not self._fill(n):
+            return b''
+        self._view = memoryview(self._buf)[:n]
+        self._consumed = n
+        return self._view
+
 
 class BambuP2SSimulator:
     """
@@ -19,250 +426,158 @@ class BambuP2SSimulator:
     def __init__(self, host: str = '0.0.0.0', port: int = 8883, 
                  camera_port: int = 6000,
                  access_code: str = 'test1234', serial_number: str = '01S00A123456789',
-                 certfile: str = None, keyfile: str = None):
+                 certfile: str = None, keyfile: str = None,
+                 compress_status: bool = False):
         self.host = host
         self.port = port
         self.camera_port = camera_port
         self.access_code = access_code
+        # Encoded once so each CONNECT compares against cached bytes
+        self._access_code_b = access_code.encode('utf-8')
         self.serial_number = serial_number
+        # Report topic pre-encoded once; every outbound PUBLISH uses it
+        self._report_topic_b = f'device/{serial_number}/report'.encode('utf-8')
         self.certfile = certfile
         self.keyfile = keyfile
+        # Deflate large status payloads before publishing. Off by
+        # default: MQTT 3.1.1 has no content-encoding negotiation, so
+        # only enable this for clients known to expect deflated reports.
+        self.compress_status = compress_status
         
-        # Add print history storage
-        self.print_history = [
-            {
-                'id': '1',
-                'gcode_file': 'test_print_1.gcode',
-                'subtask_name': 'Test Print 1',
-                'profile_id': '0',
-                'task_id': '1',
-                'weight': 15.5,
-                'length': 3500,
-                'start_time': int(time.time()) - 7200,
-                'end_time': int(time.time()) - 3600,
-                'cost_time': 3600,
-                'result': 'success',
-                'reason': 0,
-                'bed_type': 'auto',
-                'nozzle_diameter': 0.4,
-                'filament_used_g': 15.5,
-                'filament_used_mm': 3500,
-                'layers': 100,
-                'thumbnail': '',
-            },
-            {
-                'id': '2',
-                'gcode_file': 'test_print_2.gcode',
-                'subtask_name': 'Test Print 2',
-                'profile_id': '0',
-                'task_id': '2',
-                'weight': 25.3,
-                'length': 5700,
-                'start_time': int(time.time()) - 14400,
-                'end_time': int(time.time()) - 10800,
-                'cost_time': 3600,
-                'result': 'success',
-                'reason': 0,
-                'bed_type': 'auto',
-                'nozzle_diameter': 0.4,
-                'filament_used_g': 25.3,
-                'filament_used_mm': 5700,
-                'layers': 150,
-                'thumbnail': '',
-            },
-            {
-                'id': '3',
-                'gcode_file': 'failed_print.gcode',
-                'subtask_name': 'Failed Print',
-                'profile_id': '0',
-                'task_id': '3',
-                'weight': 10.0,
-                'length': 2000,
-                'start_time': int(time.time()) - 21600,
-                'end_time': int(time.time()) - 20400,
-                'cost_time': 1200,
-                'result': 'failed',
-                'reason': 16777216,
-                'bed_type': 'auto',
-                'nozzle_diameter': 0.4,
-                'filament_used_g': 5.2,
-                'filament_used_mm': 1100,
-                'layers': 35,
-                'thumbnail': '',
-            }
-        ]
+        # Seeded print history (see _PRINT_HISTORY_TEMPLATE), newest
+        # first; the deque caps itself at 50 and makes appendleft O(1)
+        self.print_history = collections.deque(
+            _initial_print_history(int(time.time())), maxlen=50)
     
+        # Pre-filtered history views, newest first: get_history answers
+        # straight from these instead of filter+sort per request
+        self._hist_success = collections.deque(
+            (h for h in self.print_history if h['result'] == 'success'), maxlen=50)
+        self._hist_failed = collections.deque(
+            (h for h in self.print_history if h['result'] == 'failed'), maxlen=50)
+
         # Track completed prints
         self.completed_prints = []
 
         # Printer state
-        self.state = {
-            'print_status': 'IDLE',
-            'progress': 0,
-            'remaining_time': 0,
-            'bed_temp': 25.0,
-            'bed_target_temp': 0.0,
-            'nozzle_temp': 25.0,
-            'nozzle_target_temp': 0.0,
-            'chamber_temp': 25.0,
-            'speed_level': 2,
-            'fan_speed': 0,
-            'layer_num': 0,
-            'total_layers': 0,
-            'print_error': 0,
-            'wifi_signal': -45,
-            'led_mode': 'on',
-            'online': True,
-        }
+        self.state = pickle.loads(_STATE_PICKLED)
         
         # AMS (Automatic Material System) state
-        self.ams = {
-            "ams": {
-                'ams': [
-                    {
-                        'id': '0',
-                        'humidity': 3,
-                        'temp': 25.0,
-                        "tray": [
-                            {
-                                "bed_temp": 0,
-                                "bed_temp_type": "0",
-                                "cols": [
-                                    "FF0000FF"
-                                ],
-                                "drying_temp": 0,
-                                "drying_time": 0,
-                                "id": "0",
-                                "nozzle_temp_max": 240,
-                                "nozzle_temp_min": 190,
-                                "remain": 0,
-                                "tag_uid": "0000000000000000",
-                                "tray_color": "FF0000FF",
-                                "tray_diameter": 0.00,
-                                "tray_id_name": "",
-                                "tray_info_idx": "GFA00",
-                                "tray_sub_brands": "",
-                                "tray_type": "PLA",
-                                "tray_uuid": "00000000000000000000000000000000",
-                                "tray_weight": 0,
-                                "xcam_info": "000000000000000000000000",
-                                "k": 0.024,
-                                "n": 0.1,
-                                "tray_temp": 240,
-                                "tray_time": 0
-                            },
-                            {
-                                "bed_temp": 0,
-                                "bed_temp_type": "0",
-                                "cols": [
-                                    "000000FF"
-                                ],
-                                "drying_temp": 0,
-                                "drying_time": 0,
-                                "id": "1",
-                                "nozzle_temp_max": 240,
-                                "nozzle_temp_min": 190,
-                                "remain": 0,
-                                "tag_uid": "0000000000000000",
-                                "tray_color": "000000FF",
-                                "tray_diameter": 0.00,
-                                "tray_id_name": "",
-                                "tray_info_idx": "GFA00",
-                                "tray_sub_brands": "",
-                                "tray_type": "PLA",
-                                "tray_uuid": "00000000000000000000000000000000",
-                                "tray_weight": 0,
-                                "xcam_info": "000000000000000000000000",
-                                "k": 0.024,
-                                "n": 0.1,
-                                "tray_temp": 240,
-                                "tray_time": 0
-                            },
-                            {
-                                "bed_temp": 0,
-                                "bed_temp_type": "0",
-                                "cols": [
-                                    "DFE2E3FF"
-                                ],
-                                "drying_temp": 0,
-                                "drying_time": 0,
-                                "id": "2",
-                                "nozzle_temp_max": 240,
-                                "nozzle_temp_min": 190,
-                                "remain": 0,
-                                "tag_uid": "0000000000000000",
-                                "tray_color": "DFE2E3FF",
-                                "tray_diameter": 0.00,
-                                "tray_id_name": "",
-                                "tray_info_idx": "GFA05",
-                                "tray_sub_brands": "",
-                                "tray_type": "PLA",
-                                "tray_uuid": "00000000000000000000000000000000",
-                                "tray_weight": 0,
-                                "xcam_info": "000000000000000000000000",
-                                "k": 0.024,
-                                "n": 0.1,
-                                "tray_temp": 240,
-                                "tray_time": 0
-                            },
-                            {
-                                "bed_temp": 0,
-                                "bed_temp_type": "0",
-                                "cols": [
-                                    "F95959FF"
-                                ],
-                                "drying_temp": 0,
-                                "drying_time": 0,
-                                "id": "3",
-                                "nozzle_temp_max": 240,
-                                "nozzle_temp_min": 190,
-                                "remain": 0,
-                                "tag_uid": "0000000000000000",
-                                "tray_color": "F95959FF",
-                                "tray_diameter": 0.00,
-                                "tray_id_name": "",
-                                "tray_info_idx": "GFL00",
-                                "tray_sub_brands": "",
-                                "tray_type": "PLA",
-                                "tray_uuid": "00000000000000000000000000000000",
-                                "tray_weight": 0,
-                                "xcam_info": "000000000000000000000000",
-                                "k": 0.024,
-                                "n": 0.1,
-                                "tray_temp": 240,
-                                "tray_time": 0
-                            }
-                        ]
-                    }
-                ],
-                "ams_exist_bits": "1",
-                "insert_flag": True,
-                "power_on_flag": False,
-                "tray_exist_bits": "e",
-                "tray_is_bbl_bits": "e",
-                "tray_now": 255, # 254 if external spool / vt_tray, otherwise is ((ams_id * 4) + tray_id) for current tray (ams 2 tray 2 would be (1*4)+1 = 5)
-                "tray_pre": 255,
-                "tray_read_done_bits": "e",
-                "tray_reading_bits": "0",
-                "tray_tar": 255,
-                "version": 4
-            }
-        }
+        self.ams = pickle.loads(_AMS_PICKLED)
         
         self.current_file = ''
         self.gcode_file_path = ''
-        
+
+        # Serialized push_status payload, rebuilt lazily: anything that
+        # mutates self.state / self.ams flips _status_dirty and the next
+        # send re-serializes once instead of on every transmission
+        self._status_cache: Optional[bytes] = None
+        self._status_dirty = True
+        # Set when a command changed state; the simulation loop coalesces
+        # these into at most one broadcast per ~200 ms window
+        self._pending_status = False
+
+        # get_version is fully static apart from the echoed sequence_id;
+        # serialize it once with a placeholder that _send_version patches
+        self._version_template = _json_dumps({
+            'print': {
+                'command': 'get_version',
+                'sequence_id': '__SEQ__',
+                'module': [
+                    {'name': 'ota', 'sw_ver': '1.02.00.00', 'hw_ver': ''},
+                    {'name': 'mc', 'sw_ver': '1.02.00.00', 'hw_ver': 'AP04'},
+                    {'name': 'esp32', 'sw_ver': '1.02.00.00', 'hw_ver': ''},
+                    {'name': 'ams', 'sw_ver': '1.02.00.00', 'hw_ver': 'AMS01'},
+                ]
+            }
+        })
+
+        # The simulated printer has one fixed AMS unit; cache its tray
+        # list and count so the hot command paths skip the nested lookups
+        self._tray_list = self.ams['ams']['ams'][0]['tray']
+        self._tray_count = len(self._tray_list)
+
+        # Command dispatch table: one hash lookup instead of walking an
+        # if/elif ladder of string compares per command
+        self._cmd_handlers = {
+            'push_all': self._cmd_push_all,
+            'get_history': self._cmd_get_history,
+            'get_version': self._cmd_get_version,
+            'start_print': self._cmd_start_print,
+            'project_file': self._cmd_start_print,
+            'pause': self._cmd_pause,
+            'resume': self._cmd_resume,
+            'stop': self._cmd_stop,
+            'gcode_line': self._cmd_gcode_line,
+            'change_filament': self._cmd_change_filament,
+        }
+
+        # Reusable push_status skeleton: the static keys are set once and
+        # _build_status only writes the volatile fields. The 'ams' entry
+        # aliases self.ams['ams'], which is mutated in place elsewhere.
+        self._status_skel = {
+            'print': {
+                'command': 'push_status',
+                'msg': 0,
+                'sequence_id': '0',
+                'gcode_state': '',
+                'mc_print_stage': '',
+                'mc_percent': 0,
+                'mc_remaining_time': 0,
+                'bed_temper': 0.0,
+                'bed_target_temper': 0.0,
+                'nozzle_temper': 0.0,
+                'nozzle_target_temper': 0.0,
+                'chamber_temper': 0.0,
+                'speed_level': 0,
+                'fan_gear': 0,
+                'layer_num': 0,
+                'total_layer_num': 0,
+                'print_error': 0,
+                'wifi_signal': 0,
+                'lights_report': [{'mode': ''}],
+                'online': {'version': 1},
+                'ipcam': {'ipcam_dev': '1', 'ipcam_record': 'enable'},
+                'gcode_file': '',
+                'subtask_name': '',
+                'stg': [],
+                'stg_cur': 0,
+                'ams': self.ams['ams'],
+            }
+        }
+
+
         # Connection management
         self.server_socket: Optional[socket.socket] = None
         self.camera_socket: Optional[socket.socket] = None
+        # Socketpair used by stop() to wake the accept loop's selector
+        self._wake_r: Optional[socket.socket] = None
+        self._wake_w: Optional[socket.socket] = None
         self.running = False
-        self.clients = []
-        self.camera_clients = []
+        self.clients: set[socket.socket] = set()
+        self.camera_clients: set[socket.socket] = set()
         self.authenticated_clients = set()
+        # Immutable snapshot of authenticated_clients, replaced under the
+        # lock on connect/disconnect; the broadcast path iterates it
+        # without copying or locking
+        self._client_snapshot: tuple = ()
+        # Guards the client sets, which are touched from the accept loop
+        # and the per-client handler threads
+        self._clients_lock = threading.Lock()
         
-        # Simulation threads
+        # Simulation thread; the event lets stop() end the loop at once
+        # instead of waiting out a sleep
         self.simulation_thread: Optional[threading.Thread] = None
-        self.camera_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+        # Broadcast fan-out pool: status frames go to all clients in
+        # parallel so one slow client cannot stall the whole tick
+        self._broadcast_pool = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix='broadcast')
+
+        # Pre-generate the fake camera frame once; the payload is
+        # placeholder data so every frame can reuse the same bytes
+        self._fake_frame = self._build_fake_frame()
         
         # Generate self-signed certificate if not provided
         self._ensure_certificates()
@@ -270,33 +585,66 @@ class BambuP2SSimulator:
     def _ensure_certificates(self):
         """Ensure SSL certificates exist, generate self-signed if needed"""
         if self.certfile is None or self.keyfile is None:
-            import tempfile
             import os
-            
-            # Create temporary directory for certificates
-            self.temp_cert_dir = tempfile.mkdtemp()
-            self.certfile = os.path.join(self.temp_cert_dir, 'cert.pem')
-            self.keyfile = os.path.join(self.temp_cert_dir, 'key.pem')
-            
+            import pathlib
+
+            # Keep generated certificates in the user cache so restarts
+            # reuse them instead of paying keygen every time
+            cache_dir = pathlib.Path(
+                os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache")
+            ) / "bambu-sim"
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self.certfile = str(cache_dir / 'cert.pem')
+            self.keyfile = str(cache_dir / 'key.pem')
+
+            if self._cached_cert_valid():
+                print(f"Reusing cached certificate: {self.certfile}")
+                return
+
             # Generate self-signed certificate
             self._generate_self_signed_cert()
+            try:
+                os.chmod(self.keyfile, 0o600)
+            except OSError:
+                pass
+
+    def _cached_cert_valid(self) -> bool:
+        """Check the cached certificate exists and has >7 days of validity"""
+        import os
+        import datetime
+
+        if not (os.path.exists(self.certfile) and os.path.exists(self.keyfile)):
+            return False
+        try:
+            from cryptography import x509
+
+            with open(self.certfile, 'rb') as f:
+                cert = x509.load_pem_x509_certificate(f.read())
+            remaining = cert.not_valid_after - datetime.datetime.utcnow()
+            return remaining > datetime.timedelta(days=7)
+        except ImportError:
+            # Can't inspect expiry without cryptography; reuse the files
+            return True
+        except Exception:
+            return False
             
     def _generate_self_signed_cert(self):
         """Generate a self-signed certificate for testing"""
         try:
             from cryptography import x509
             from cryptography.x509.oid import NameOID
-            from cryptography.hazmat.primitives import hashes
-            from cryptography.hazmat.primitives.asymmetric import rsa
+            from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
             from cryptography.hazmat.primitives import serialization
             import datetime
-            
-            # Generate private key
-            private_key = rsa.generate_private_key(
-                public_exponent=65537,
-                key_size=2048,
-            )
-            
+
+            # Generate private key (Ed25519: near-instant keygen and much
+            # cheaper handshake signatures than RSA-2048)
+            private_key = Ed25519PrivateKey.generate()
+
+            # Single timestamp for both validity bounds
+            now = datetime.datetime.utcnow()
+
+
             # Create certificate
             subject = issuer = x509.Name([
                 x509.NameAttribute(NameOID.COUNTRY_NAME, "US"),
@@ -315,9 +663,9 @@ class BambuP2SSimulator:
             ).serial_number(
                 x509.random_serial_number()
             ).not_valid_before(
-                datetime.datetime.utcnow()
+                now
             ).not_valid_after(
-                datetime.datetime.utcnow() + datetime.timedelta(days=365)
+                now + datetime.timedelta(days=365)
             ).add_extension(
                 x509.SubjectAlternativeName([
                     x509.DNSName("localhost"),
@@ -325,13 +673,13 @@ class BambuP2SSimulator:
                     x509.IPAddress(ipaddress.IPv4Address("127.0.0.1")),
                 ]),
                 critical=False,
-            ).sign(private_key, hashes.SHA256())
+            ).sign(private_key, None)  # Ed25519 requires algorithm=None
             
             # Write private key
             with open(self.keyfile, 'wb') as f:
                 f.write(private_key.private_bytes(
                     encoding=serialization.Encoding.PEM,
-                    format=serialization.PrivateFormat.TraditionalOpenSSL,
+                    format=serialization.PrivateFormat.PKCS8,
                     encryption_algorithm=serialization.NoEncryption()
                 ))
             
@@ -348,123 +696,153 @@ class BambuP2SSimulator:
             
             print("Generating self-signed certificate using OpenSSL...")
             subprocess.run([
-                'openssl', 'req', '-x509', '-newkey', 'rsa:2048',
+                'openssl', 'req', '-x509', '-newkey', 'ed25519',
                 '-keyout', self.keyfile,
                 '-out', self.certfile,
                 '-days', '365', '-nodes',
                 '-subj', '/CN=bambu-simulator.local'
             ], check=True)
     
-    def _start_camera_server(self):
-        """Start the camera streaming server on port 6000"""
+    def _setup_camera_server(self):
+        """Create the camera streaming listener on port 6000"""
+        # Create raw socket for camera
+        self.camera_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.camera_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.camera_socket.bind((self.host, self.camera_port))
+        self.camera_socket.listen(5)
+
+        # Wrap with SSL using same certificate
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        # context.load_cert_chain(self.certfile, self.keyfile)
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        # Keep session tickets enabled so reconnecting clients resume the
+        # session instead of paying a full handshake
+        context.options &= ~ssl.OP_NO_TICKET
+
+        self.camera_ssl_context = context
+
+        print(f"Bambu Camera Server started on {self.host}:{self.camera_port} (TLS)")
+
+    def _accept_mqtt(self):
+        """Accept one pending MQTT client connection"""
+        client_socket, address = self.server_socket.accept()
+
+        # MQTT traffic is small request/response packets; disable Nagle so
+        # replies are not held back waiting for a delayed ACK. Set on the
+        # raw socket before wrapping so it applies to the underlying fd.
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        # Wrap client socket with SSL
         try:
-            # Create raw socket for camera
-            self.camera_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.camera_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.camera_socket.bind((self.host, self.camera_port))
-            self.camera_socket.listen(5)
-            
-            # Wrap with SSL using same certificate
-            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-            # context.load_cert_chain(self.certfile, self.keyfile)
-            context.minimum_version = ssl.TLSVersion.TLSv1_2
-            context.check_hostname = False
-            context.verify_mode = ssl.CERT_NONE
-            
-            self.camera_ssl_context = context
-            
-            print(f"Bambu Camera Server started on {self.host}:{self.camera_port} (TLS)")
-            
-            # Accept camera connections
-            while self.running:
-                try:
-                    self.camera_socket.settimeout(1.0)
-                    client_socket, address = self.camera_socket.accept()
-
-                    # Wrap client socket with SSL
-                    try:
-                        ssl_client = self.camera_ssl_context.wrap_socket(client_socket, server_side=True)
-                        print(f"Camera client connected from {address} (TLS established)")
-                        
-                        client_thread = threading.Thread(
-                            target=self._handle_camera_client,
-                            args=(ssl_client, address)
-                        )
-                        client_thread.daemon = True
-                        client_thread.start()
-                        self.camera_clients.append(ssl_client)
-                        
-                    except ssl.SSLError as e:
-                        print(f"Camera SSL handshake failed with {address}: {e}")
-                        client_socket.close()
-                        
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    if self.running:
-                        print(f"Camera server error: {e}")
-                        
-        except Exception as e:
-            print(f"Failed to start camera server: {e}")
-            import traceback
-            traceback.print_exc()
+            ssl_client = self.ssl_context.wrap_socket(client_socket, server_side=True)
+            print(f"Client connected from {address} (TLS established)")
+
+            client_thread = threading.Thread(
+                target=self._handle_client,
+                args=(ssl_client, address)
+            )
+            client_thread.daemon = True
+            client_thread.start()
+            with self._clients_lock:
+                self.clients.add(ssl_client)
+
+        except ssl.SSLError as e:
+            print(f"SSL handshake failed with {address}: {e}")
+            client_socket.close()
+
+    def _accept_camera(self):
+        """Accept one pending camera client connection"""
+        client_socket, address = self.camera_socket.accept()
+
+        # Camera clients get bulk outbound JPEG data: a larger send buffer
+        # raises the throughput ceiling, and TCP_NODELAY keeps frame
+        # boundaries from stalling on delayed ACKs. Set on the raw socket
+        # before wrapping so the options apply to the underlying fd.
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 262144)
+
+        # Wrap client socket with SSL
+        try:
+            ssl_client = self.camera_ssl_context.wrap_socket(client_socket, server_side=True)
+            print(f"Camera client connected from {address} (TLS established)")
+
+            client_thread = threading.Thread(
+                target=self._handle_camera_client,
+                args=(ssl_client, address)
+            )
+            client_thread.daemon = True
+            client_thread.start()
+            with self._clients_lock:
+                self.camera_clients.add(ssl_client)
+
+        except ssl.SSLError as e:
+            print(f"Camera SSL handshake failed with {address}: {e}")
+            client_socket.close()
     
     def _handle_camera_client(self, client_socket: socket.socket, address):
         """Handle camera client connections"""
         try:
             # Send camera stream header (simulated JPEG stream)
-            header = (
-                b"HTTP/1.1 200 OK\r\n"
-                b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
-                b"Cache-Control: no-cache\r\n"
-                b"Connection: close\r\n"
-                b"\r\n"
-            )
-            client_socket.sendall(header)
+            client_socket.sendall(_CAMERA_STREAM_HEADER)
             
             frame_count = 0
-            
-            # Stream simulated frames
+
+            # Pace frames against a monotonic deadline rather than a fixed
+            # sleep, so the send cost does not drag the rate below 10 FPS
+            next_deadline = time.monotonic()
+
+            # Stream simulated frames; the loop body is try-free — a
+            # dropped connection raises ConnectionError into the outer
+            # handler below instead of being re-checked every frame
             while self.running:
-                try:
-                    # Generate a fake JPEG frame (placeholder data)
-                    frame_data = self._generate_fake_frame(frame_count)
-                    
-                    # Send frame with multipart boundary
-                    frame_header = (
-                        b"--frame\r\n"
-                        b"Content-Type: image/jpeg\r\n"
-                        b"Content-Length: " + str(len(frame_data)).encode() + b"\r\n"
-                        b"\r\n"
-                    )
-                    
-                    client_socket.sendall(frame_header + frame_data + b"\r\n")
-                    
-                    frame_count += 1
-                    time.sleep(0.1)  # ~10 FPS
-                    
-                except (BrokenPipeError, ConnectionResetError):
-                    break
-                except Exception as e:
-                    print(f"Camera stream error: {e}")
-                    break
-                    
+                # Generate a fake JPEG frame (placeholder data)
+                frame_data = self._generate_fake_frame(frame_count)
+
+                # Assemble the whole multipart frame once and write it
+                # with a single sendall, so each frame is one TLS
+                # record instead of several small ones
+                out = b"".join((
+                    b"--frame\r\n"
+                    b"Content-Type: image/jpeg\r\n"
+                    b"Content-Length: ",
+                    str(len(frame_data)).encode(),
+                    b"\r\n\r\n",
+                    frame_data,
+                    b"\r\n",
+                ))
+                client_socket.sendall(out)
+
+                frame_count += 1
+
+                # ~10 FPS; if a slow client put us behind schedule,
+                # skip the sleep and restart the deadline from now
+                next_deadline += 0.1
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_deadline = time.monotonic()
+
+        except ConnectionError:
+            pass  # client went away; cleanup happens in finally
         except Exception as e:
             print(f"Camera client handler error: {e}")
         finally:
-            if client_socket in self.camera_clients:
-                self.camera_clients.remove(client_socket)
+            with self._clients_lock:
+                self.camera_clients.discard(client_socket)
             try:
                 client_socket.close()
             except:
                 pass
             print(f"Camera client {address} disconnected")
     
-    def _generate_fake_frame(self, frame_count: int) -> bytes:
-        """Generate a fake JPEG frame for testing"""
+    def _build_fake_frame(self) -> bytes:
+        """Build the fake JPEG frame used for every streamed frame"""
         # This is a minimal valid JPEG header + some random data
         # In a real implementation, you'd generate actual images
-        
+
         # JPEG header
         jpeg_header = bytes([
             0xFF, 0xD8,  # SOI (Start of Image)
@@ -476,99 +854,114 @@ class BambuP2SSimulator:
             0x00, 0x01, 0x00, 0x01,  # X/Y density
             0x00, 0x00,  # Thumbnail
         ])
-        
-        # Add some random data to simulate image content
-        random_data = bytes([random.randint(0, 255) for _ in range(1024)])
-        
+
+        # Add some random data to simulate image content; randbytes does
+        # this in one C call instead of 1024 randint round-trips
+        random_data = random.randbytes(1024)
+
         # JPEG footer
         jpeg_footer = bytes([0xFF, 0xD9])  # EOI (End of Image)
-        
+
         # Combine to create a "fake" JPEG
-        frame = jpeg_header + random_data + jpeg_footer
-        
-        return frame
+        return jpeg_header + random_data + jpeg_footer
+
+    def _generate_fake_frame(self, frame_count: int) -> bytes:
+        """Return the pre-generated JPEG frame for testing"""
+        return self._fake_frame
             
     def start(self):
         """Start the simulator server"""
         self.running = True
-        
+
         # Create raw socket for MQTT
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind((self.host, self.port))
         self.server_socket.listen(5)
-        
+
         # Wrap with SSL
         context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
         context.load_cert_chain(self.certfile, self.keyfile)
         context.minimum_version = ssl.TLSVersion.TLSv1_2
         context.check_hostname = False
         context.verify_mode = ssl.CERT_NONE
-        
+        # Keep session tickets enabled so reconnecting clients resume the
+        # session instead of paying a full handshake
+        context.options &= ~ssl.OP_NO_TICKET
+
         self.ssl_context = context
-        
+
         print(f"Bambu P2S Simulator started on {self.host}:{self.port} (TLS)")
         print(f"Serial Number: {self.serial_number}")
         print(f"Access Code: {self.access_code}")
         print(f"Certificate: {self.certfile}")
-        
-        # Start camera server thread
-        self.camera_thread = threading.Thread(target=self._start_camera_server)
-        self.camera_thread.daemon = True
-        self.camera_thread.start()
-        
+
+        # Camera listener, served from the same accept loop
+        self._setup_camera_server()
+
         # Start simulation thread
         self.simulation_thread = threading.Thread(target=self._simulate_printer)
         self.simulation_thread.daemon = True
         self.simulation_thread.start()
-        
-        # Accept MQTT connections
-        while self.running:
-            try:
-                self.server_socket.settimeout(1.0)
-                client_socket, address = self.server_socket.accept()
-                
-                # Wrap client socket with SSL
+
+        # Wake-up socketpair: stop() writes a byte to break the selector
+        # out of its blocking select immediately instead of polling on a
+        # one-second timeout
+        self._wake_r, self._wake_w = socket.socketpair()
+
+        # One selector-driven accept loop handles both listeners instead
+        # of an accept thread per server
+        selector = selectors.DefaultSelector()
+        selector.register(self.server_socket, selectors.EVENT_READ, self._accept_mqtt)
+        selector.register(self.camera_socket, selectors.EVENT_READ, self._accept_camera)
+        selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+        with selector:
+            while self.running:
                 try:
-                    ssl_client = self.ssl_context.wrap_socket(client_socket, server_side=True)
-                    print(f"Client connected from {address} (TLS established)")
-                    
-                    client_thread = threading.Thread(
-                        target=self._handle_client,
-                        args=(ssl_client, address)
-                    )
-                    client_thread.daemon = True
-                    client_thread.start()
-                    self.clients.append(ssl_client)
-                    
-                except ssl.SSLError as e:
-                    print(f"SSL handshake failed with {address}: {e}")
-                    client_socket.close()
-                    
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if self.running:
-                    print(f"Error accepting connection: {e}")
-                    
+                    for key, _ in selector.select():
+                        if key.data is None:
+                            # Shutdown signal; self.running is False now
+                            break
+                        key.data()
+                except Exception as e:
+                    if self.running:
+                        print(f"Error accepting connection: {e}")
+
+        self._wake_r.close()
+        self._wake_w.close()
+
     def stop(self):
         """Stop the simulator server"""
         self.running = False
-        
+
+        # Wake the simulation loop out of its sleep
+        self._stop_event.set()
+
+        # Wake the accept loop so shutdown is immediate
+        if self._wake_w is not None:
+            try:
+                self._wake_w.send(b"x")
+            except OSError:
+                pass
+
         # Close all MQTT clients
-        for client in self.clients:
+        for client in list(self.clients):
             try:
                 client.close()
             except:
                 pass
         
         # Close all camera clients
-        for client in self.camera_clients:
+        for client in list(self.camera_clients):
             try:
                 client.close()
             except:
                 pass
         
+        # Stop queueing broadcast writes
+        self._broadcast_pool.shutdown(wait=False)
+
         # Close server sockets
         if self.server_socket:
             self.server_socket.close()
@@ -581,32 +974,27 @@ class BambuP2SSimulator:
        """Handle individual client connections"""
        authenticated = False
        
+       reader = _SocketReader(client_socket)
+
        try:
            while self.running:
-               # Read MQTT packet header
-               first_byte = client_socket.recv(1)
+               # Read MQTT packet header out of the receive buffer
+               first_byte = reader.read(1)
                if not first_byte:
                    break
 
                packet_type = (first_byte[0] >> 4) & 0x0F
-               
+
                # Read remaining length (variable length encoding)
-               remaining_length = 0
-               multiplier = 1
-               while True:
-                   byte_data = client_socket.recv(1)
-                   if not byte_data:
-                       return
-                   byte = byte_data[0]
-                   remaining_length += (byte & 0x7F) * multiplier
-                   if (byte & 0x80) == 0:
-                       break
-                   multiplier *= 128
+               remaining_length = reader.read_varint()
+               if remaining_length < 0:
+                   return
 
-               # Read the packet payload
+               # Read the packet payload as a view into the receive
+               # buffer; the handlers only slice it, so no copy is made
                if remaining_length > 0:
-                   payload = client_socket.recv(remaining_length)
-                   if len(payload) != remaining_length:
+                   payload = reader.readview(remaining_length)
+                   if not payload:
                        print(f"Incomplete packet received")
                        break
                else:
@@ -627,7 +1015,7 @@ class BambuP2SSimulator:
                        
                elif packet_type == 12:  # PINGREQ
                    # Send PINGRESP
-                   client_socket.send(bytearray([0xD0, 0x00]))
+                   client_socket.send(_PINGRESP)
                    
                elif packet_type == 14:  # DISCONNECT
                    print(f"Client {address} disconnecting")
@@ -638,79 +1026,82 @@ class BambuP2SSimulator:
                    
        except Exception as e:
            print(f"Client handler error: {e}")
-           import traceback
-           traceback.print_exc()
+           log.debug("Client handler error", exc_info=True)
        finally:
-           if client_socket in self.authenticated_clients:
-               self.authenticated_clients.remove(client_socket)
-           if client_socket in self.clients:
-               self.clients.remove(client_socket)
+           with self._clients_lock:
+               self.authenticated_clients.discard(client_socket)
+               self._client_snapshot = tuple(self.authenticated_clients)
+               self.clients.discard(client_socket)
            try:
                client_socket.close()
            except:
                pass
            print(f"Client {address} disconnected")
 
-    def _handle_mqtt_connect(self, client_socket: socket.socket, payload: bytes):
+    def _handle_mqtt_connect(self, client_socket: socket.socket, payload: memoryview):
        """Handle MQTT CONNECT packet"""
        try:
+           # payload is already a memoryview into the reader's buffer
+           mv = payload
            offset = 0
-           
+
            # Protocol Name Length (2 bytes)
-           protocol_name_len = struct.unpack(">H", payload[offset:offset+2])[0]
+           (protocol_name_len,) = _U16.unpack_from(mv, offset)
            offset += 2
-           
+
            # Protocol Name
-           protocol_name = payload[offset:offset+protocol_name_len].decode('utf-8')
+           protocol_name = str(mv[offset:offset+protocol_name_len], 'utf-8')
            offset += protocol_name_len
-           
+
            # Protocol Level (1 byte)
-           protocol_level = payload[offset]
+           protocol_level = mv[offset]
            offset += 1
-           
+
            # Connect Flags (1 byte)
-           connect_flags = payload[offset]
+           connect_flags = mv[offset]
            offset += 1
-           
+
            username_flag = (connect_flags >> 7) & 1
            password_flag = (connect_flags >> 6) & 1
-           
+
            # Keep Alive (2 bytes)
-           keep_alive = struct.unpack(">H", payload[offset:offset+2])[0]
+           (keep_alive,) = _U16.unpack_from(mv, offset)
            offset += 2
-           
+
            # Client ID Length (2 bytes)
-           client_id_len = struct.unpack(">H", payload[offset:offset+2])[0]
+           (client_id_len,) = _U16.unpack_from(mv, offset)
            offset += 2
-           
+
            # Client ID
-           client_id = payload[offset:offset+client_id_len].decode('utf-8')
+           client_id = str(mv[offset:offset+client_id_len], 'utf-8')
            offset += client_id_len
-           
-           # Username (if flag is set)
+
+           # Username (if flag is set); kept as bytes for the comparison
            username = None
            if username_flag:
-               username_len = struct.unpack(">H", payload[offset:offset+2])[0]
+               (username_len,) = _U16.unpack_from(mv, offset)
                offset += 2
-               username = payload[offset:offset+username_len].decode('utf-8')
+               username = bytes(mv[offset:offset+username_len])
                offset += username_len
-           
-           # Password (if flag is set)
+
+           # Password (if flag is set); kept as bytes for compare_digest
            password = None
            if password_flag:
-               password_len = struct.unpack(">H", payload[offset:offset+2])[0]
+               (password_len,) = _U16.unpack_from(mv, offset)
                offset += 2
-               password = payload[offset:offset+password_len].decode('utf-8')
+               password = bytes(mv[offset:offset+password_len])
                offset += password_len
-           
+
            print(f"MQTT CONNECT - Client: {client_id}, User: {username}, Pass: {password}")
-           
-           # Authenticate
-           if username == 'bblp' and password == self.access_code:
+
+           # Authenticate (constant-time compare against the cached bytes)
+           if (username == _MQTT_USERNAME and password is not None
+                   and hmac.compare_digest(password, self._access_code_b)):
                # Send CONNACK - connection accepted
-               connack = bytearray([0x20, 0x02, 0x00, 0x00])
-               client_socket.send(connack)
-               self.authenticated_clients.add(client_socket)
+               client_socket.send(_CONNACK_OK)
+               with self._clients_lock:
+                   self.authenticated_clients.add(client_socket)
+                   self._client_snapshot = tuple(self.authenticated_clients)
                print("Authentication successful")
                
                # Send initial status
@@ -718,76 +1109,72 @@ class BambuP2SSimulator:
                self._send_full_status_mqtt(client_socket, '0')
            else:
                # Send CONNACK - connection refused
-               connack = bytearray([0x20, 0x02, 0x00, 0x05])  # 0x05 = not authorized
-               client_socket.send(connack)
+               client_socket.send(_CONNACK_BAD)
                print("Authentication failed")
                
        except Exception as e:
            print(f"Error handling CONNECT: {e}")
-           import traceback
-           traceback.print_exc()
+           log.debug("Error handling CONNECT", exc_info=True)
 
-    def _handle_mqtt_publish(self, client_socket: socket.socket, flags: int, payload: bytes):
+    def _handle_mqtt_publish(self, client_socket: socket.socket, flags: int, payload: memoryview):
        """Handle MQTT PUBLISH packet"""
        try:
            qos = (flags >> 1) & 0x03
            offset = 0
            
            # Topic length
-           topic_len = struct.unpack(">H", payload[offset:offset+2])[0]
+           (topic_len,) = _U16.unpack_from(payload, offset)
            offset += 2
-           
-           # Topic
-           topic = payload[offset:offset+topic_len].decode('utf-8')
+
+           # Topic, kept as raw bytes: it is only logged here, so there
+           # is no need to allocate a decoded str per packet
+           topic = bytes(payload[offset:offset+topic_len])
            offset += topic_len
-           
+
            # Packet ID (if QoS > 0)
            packet_id = None
            if qos > 0:
-               packet_id = struct.unpack(">H", payload[offset:offset+2])[0]
+               (packet_id,) = _U16.unpack_from(payload, offset)
                offset += 2
-           
+
            # Message payload
            message_payload = payload[offset:]
-           
-           print(f"PUBLISH - Topic: {topic}, QoS: {qos}, Payload length: {len(message_payload)}")
+
+           print(f"PUBLISH - Topic: {topic!r}, QoS: {qos}, Payload length: {len(message_payload)}")
            
            # Send PUBACK if QoS = 1
            if qos == 1 and packet_id is not None:
-               puback = bytearray([0x40, 0x02])
-               puback.extend(struct.pack(">H", packet_id))
-               client_socket.send(puback)
+               client_socket.send(b"\x40\x02" + _U16.pack(packet_id))
            
            # Parse and handle the JSON message
            try:
-               message = json.loads(message_payload.decode('utf-8'))
+               message = _json_loads(message_payload)
                self._handle_command(client_socket, message)
-           except json.JSONDecodeError as e:
+           except ValueError as e:
                print(f"Invalid JSON in PUBLISH: {e}")
                
        except Exception as e:
            print(f"Error handling PUBLISH: {e}")
-           import traceback
-           traceback.print_exc()
+           log.debug("Error handling PUBLISH", exc_info=True)
 
-    def _handle_mqtt_subscribe(self, client_socket: socket.socket, payload: bytes):
+    def _handle_mqtt_subscribe(self, client_socket: socket.socket, payload: memoryview):
        """Handle MQTT SUBSCRIBE packet"""
        try:
            offset = 0
            
            # Packet ID
-           packet_id = struct.unpack(">H", payload[offset:offset+2])[0]
+           (packet_id,) = _U16.unpack_from(payload, offset)
            offset += 2
-           
+
            granted_qos = []
-           
+
            while offset < len(payload):
                # Topic length
-               topic_len = struct.unpack(">H", payload[offset:offset+2])[0]
+               (topic_len,) = _U16.unpack_from(payload, offset)
                offset += 2
-               
+
                # Topic
-               topic = payload[offset:offset+topic_len].decode('utf-8')
+               topic = str(payload[offset:offset+topic_len], 'utf-8')
                offset += topic_len
                
                # Requested QoS
@@ -798,261 +1185,288 @@ class BambuP2SSimulator:
                granted_qos.append(qos)
            
            # Send SUBACK
-           suback = bytearray([0x90, 1 + len(granted_qos)])
-           suback.extend(struct.pack(">H", packet_id))
+           suback = bytearray((0x90, 2 + len(granted_qos)))
+           suback += _U16.pack(packet_id)
            suback.extend(granted_qos)
            client_socket.send(suback)
            
        except Exception as e:
            print(f"Error handling SUBSCRIBE: {e}")
-           import traceback
-           traceback.print_exc()
+           log.debug("Error handling SUBSCRIBE", exc_info=True)
 
     def _send_message(self, client_socket: socket.socket, message: Dict[str, Any]):
        """Send JSON message to client via MQTT PUBLISH"""
-       self._send_mqtt_publish(client_socket, 'device/01S00A123456789/report', message)
+       self._send_mqtt_publish(client_socket, self._report_topic_b, message)
 
     def _send_mqtt_publish(self, client_socket: socket.socket, topic: str, message: Dict[str, Any], qos: int = 0):
        """Send MQTT PUBLISH packet"""
        try:
-           json_str = json.dumps(message)
-           payload = json_str.encode('utf-8')
-           
+           # Pre-serialized payloads (the cached status) pass through
+           if isinstance(message, (bytes, bytearray)):
+               payload = message
+           else:
+               payload = _json_dumps(message)
+
            # Build PUBLISH packet
-           topic_bytes = topic.encode('utf-8')
-           
-           # Fixed header
-           packet_type = 0x30 | (qos << 1)  # PUBLISH with QoS
-           
-           # Variable header + payload
-           variable_header = bytearray()
-           variable_header.extend(struct.pack(">H", len(topic_bytes)))
-           variable_header.extend(topic_bytes)
-           
-           # Add packet ID if QoS > 0
-           if qos > 0:
-               packet_id = 1  # Simplified - should track packet IDs
-               variable_header.extend(struct.pack(">H", packet_id))
-           
-           variable_header.extend(payload)
-           
-           # Encode remaining length
-           remaining_length = len(variable_header)
-           encoded_length = bytearray()
-           while True:
-               byte = remaining_length % 128
-               remaining_length = remaining_length // 128
-               if remaining_length > 0:
-                   byte |= 0x80
-               encoded_length.append(byte)
-               if remaining_length == 0:
-                   break
-           
-           # Send packet
-           packet = bytearray([packet_type])
-           packet.extend(encoded_length)
-           packet.extend(variable_header)
-           
-           client_socket.sendall(packet)
+           if isinstance(topic, bytes):
+               topic_bytes = topic
+           else:
+               topic_bytes = topic.encode('utf-8')
+
+           # Fixed header byte comes from the preencoded constants for
+           # the common QoS levels instead of a fresh 1-byte allocation
+           if qos == 0:
+               first_byte = _PUBLISH_Q0
+               packet_id_bytes = b''
+           else:
+               first_byte = _PUBLISH_Q1 if qos == 1 else bytes((0x30 | (qos << 1),))
+               packet_id_bytes = _U16.pack(1)  # Simplified - should track packet IDs
+
+           # Hand the pieces to the gather-send helper; no intermediate
+           # bytearray is grown either way
+           remaining_length = 2 + len(topic_bytes) + len(packet_id_bytes) + len(payload)
+           _sendv(client_socket, (
+               first_byte,
+               _encode_varint(remaining_length),
+               _U16.pack(len(topic_bytes)),
+               topic_bytes,
+               packet_id_bytes,
+               payload,
+           ))
            
        except Exception as e:
            print(f"Send MQTT message error: {e}")
-           import traceback
-           traceback.print_exc()
+           log.debug("Send MQTT message error", exc_info=True)
+
+    def _send_mqtt_publish_batch(self, client_socket: socket.socket, topic: str, messages: list):
+       """Send several messages as back-to-back PUBLISH frames in one write
+
+       Each message is still a standard MQTT 3.1.1 PUBLISH, but
+       concatenating the frames means one syscall (and one TLS record)
+       for the whole batch instead of one per message.
+       """
+       try:
+           if isinstance(topic, bytes):
+               topic_bytes = topic
+           else:
+               topic_bytes = topic.encode('utf-8')
+           batch = b"".join(
+               self._build_publish_frame(topic_bytes, _json_dumps(message))
+               for message in messages
+           )
+           client_socket.sendall(batch)
+       except Exception as e:
+           print(f"Send MQTT batch error: {e}")
+           log.debug("Send MQTT batch error", exc_info=True)
+
+    def _build_status(self, sequence_id: str) -> Dict[str, Any]:
+       """Refresh the shared push_status dict's volatile fields"""
+       state = self.state
+       p = self._status_skel['print']
+       p['sequence_id'] = sequence_id
+       p['gcode_state'] = state['print_status']
+       p['mc_print_stage'] = state['print_status']
+       p['mc_percent'] = state['progress']
+       p['mc_remaining_time'] = state['remaining_time']
+       p['bed_temper'] = state['bed_temp']
+       p['bed_target_temper'] = state['bed_target_temp']
+       p['nozzle_temper'] = state['nozzle_temp']
+       p['nozzle_target_temper'] = state['nozzle_target_temp']
+       p['chamber_temper'] = state['chamber_temp']
+       p['speed_level'] = state['speed_level']
+       p['fan_gear'] = state['fan_speed']
+       p['layer_num'] = state['layer_num']
+       p['total_layer_num'] = state['total_layers']
+       p['print_error'] = state['print_error']
+       p['wifi_signal'] = state['wifi_signal']
+       p['lights_report'][0]['mode'] = state['led_mode']
+       p['gcode_file'] = self.current_file
+       p['subtask_name'] = self.current_file
+       return self._status_skel
+
+    def _status_payload(self) -> bytes:
+       """Serialized push_status for sequence_id '0', cached until dirty"""
+       if self._status_dirty or self._status_cache is None:
+           payload = _json_dumps(self._build_status('0'))
+           if self.compress_status and len(payload) > _COMPRESS_THRESHOLD:
+               # level 1: a few microseconds of CPU for ~4-6x fewer bytes
+               # on the wire per client
+               payload = zlib.compress(payload, 1)
+           self._status_cache = payload
+           self._status_dirty = False
+       return self._status_cache
 
     def _send_full_status_mqtt(self, client_socket: socket.socket, sequence_id: str):
        """Send full printer status via MQTT"""
-       status = {
-           'print': {
-               'command': 'push_status',
-               'msg': 0,
-               'sequence_id': sequence_id,
-               'gcode_state': self.state['print_status'],
-               'mc_print_stage': self.state['print_status'],
-               'mc_percent': self.state['progress'],
-               'mc_remaining_time': self.state['remaining_time'],
-               'bed_temper': self.state['bed_temp'],
-               'bed_target_temper': self.state['bed_target_temp'],
-               'nozzle_temper': self.state['nozzle_temp'],
-               'nozzle_target_temper': self.state['nozzle_target_temp'],
-               'chamber_temper': self.state['chamber_temp'],
-               'speed_level': self.state['speed_level'],
-               'fan_gear': self.state['fan_speed'],
-               'layer_num': self.state['layer_num'],
-               'total_layer_num': self.state['total_layers'],
-               'print_error': self.state['print_error'],
-               'wifi_signal': self.state['wifi_signal'],
-               'lights_report': [{'mode': self.state['led_mode']}],
-               'online': {'version': 1},
-               'ipcam': {'ipcam_dev': '1', 'ipcam_record': 'enable'},
-               'gcode_file': self.current_file,
-               'subtask_name': self.current_file,
-               'stg': [],
-               'stg_cur': 0,
-               **self.ams
-           }
-       }
-       self._send_mqtt_publish(client_socket, f'device/{self.serial_number}/report', status)
-       
+       if sequence_id == '0':
+           # Broadcast path: reuse the cached serialization
+           payload = self._status_payload()
+       else:
+           payload = _json_dumps(self._build_status(sequence_id))
+       self._send_mqtt_publish(client_socket, self._report_topic_b, payload)
+
+    def _mark_status_dirty(self):
+        """Record a state/AMS mutation.
+
+        Invalidates the serialized status cache and asks the simulation
+        loop to broadcast within its next coalescing window, so a burst
+        of commands produces one fan-out instead of one per change.
+        """
+        self._status_dirty = True
+        self._pending_status = True
+
+    @staticmethod
+    def _ack(command: str, sequence_id: str, result: str = 'success', **extra) -> Dict[str, Any]:
+        """Build a standard command acknowledgement"""
+        response = {
+            'print': {
+                'command': command,
+                'result': result,
+                'sequence_id': sequence_id,
+            }
+        }
+        if extra:
+            response['print'].update(extra)
+        return response
+
+    def _cmd_push_all(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        self._send_full_status_mqtt(client_socket, sequence_id)
+
+    def _cmd_get_history(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        self._send_history(client_socket, sequence_id, command_data)
+
+    def _cmd_get_version(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        self._send_version(client_socket, sequence_id)
+
+    def _cmd_start_print(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        self.current_file = command_data.get('gcode_file', 'test.gcode')
+        state = self.state
+        state['print_status'] = 'RUNNING'
+        state['progress'] = 0
+        state['layer_num'] = 0
+        state['total_layers'] = 100
+        state['remaining_time'] = 3600
+
+        tray_id = command_data.get('ams_tray', 0)
+        if 0 <= tray_id < self._tray_count:
+            tray = self._tray_list[tray_id]
+            state['bed_target_temp'] = tray['bed_temp']
+            state['nozzle_target_temp'] = tray['nozzle_temp_min'] + 10
+            self.ams['ams']['tray_now'] = tray_id
+
+        self._mark_status_dirty()
+        return self._ack('start_print', sequence_id)
+
+    def _cmd_pause(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        self.state['print_status'] = 'PAUSED'
+        self._mark_status_dirty()
+        return self._ack('pause', sequence_id)
+
+    def _cmd_resume(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        self.state['print_status'] = 'RUNNING'
+        self._mark_status_dirty()
+        return self._ack('resume', sequence_id)
+
+    def _cmd_stop(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        # Record as failed/cancelled
+        self._record_print_completion(success=False, reason=50331648)
+
+        state = self.state
+        state['print_status'] = 'IDLE'
+        state['progress'] = 0
+        state['bed_target_temp'] = 0
+        state['nozzle_target_temp'] = 0
+        self.ams['ams']['tray_now'] = 255
+        self._mark_status_dirty()
+        return self._ack('stop', sequence_id)
+
+    def _cmd_gcode_line(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        self._execute_gcode(command_data.get('gcode', ''))
+        return self._ack('gcode_line', sequence_id)
+
+    def _cmd_change_filament(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
+        tray_id = command_data.get('target_ams', 0)
+        if 0 <= tray_id < self._tray_count:
+            self.ams['ams']['tray_now'] = tray_id
+            self._mark_status_dirty()
+            return self._ack('change_filament', sequence_id)
+        return self._ack('change_filament', sequence_id,
+                         result='failed', reason='Invalid tray')
+
     def _handle_command(self, client_socket: socket.socket, message: Dict[str, Any]):
         """Handle authenticated commands from client"""
         try:
             print(message)
-            for key, command in message.items():
+            # Responses are collected and flushed as one batched write so
+            # a multi-command message costs a single send
+            responses = []
+            for key in message:
                 command_data = message.get(key, {})
                 command = command_data.get('command', '')
                 sequence_id = command_data.get('sequence_id', '0')
-                
+
                 print(f"Received command: {command}")
-                
-                if command == 'push_all':
-                    self._send_full_status(client_socket, sequence_id)
-                    
-                elif command == 'get_history':
-                    self._send_history(client_socket, sequence_id, command_data)
 
-                elif command == 'get_version':
-                    self._send_version(client_socket, sequence_id)
-                    
-                elif command == 'start_print' or command == 'project_file' :
-                    self.current_file = command_data.get('gcode_file', 'test.gcode')
-                    self.state['print_status'] = 'RUNNING'
-                    self.state['progress'] = 0
-                    self.state['layer_num'] = 0
-                    self.state['total_layers'] = 100
-                    self.state['remaining_time'] = 3600
-                    
-                    tray_id = command_data.get('ams_tray', 0)
-                    if tray_id < len(self.ams['ams']['ams'][0]['tray']):
-                        tray = self.ams['ams']['ams'][0]['tray'][tray_id]
-                        self.state['bed_target_temp'] = tray['bed_temp']
-                        self.state['nozzle_target_temp'] = tray['nozzle_temp_min'] + 10
-                        self.ams['ams']['tray_now'] = tray_id
-                    
-                    response = {
-                        'print': {
-                            'command': 'start_print',
-                            'result': 'success',
-                            'sequence_id': sequence_id
-                        }
-                    }
-                    self._send_message(client_socket, response)
-                    
-                elif command == 'pause':
-                    self.state['print_status'] = 'PAUSED'
-                    response = {
-                        'print': {
-                            'command': 'pause',
-                            'result': 'success',
-                            'sequence_id': sequence_id
-                        }
-                    }
-                    self._send_message(client_socket, response)
-                    
-                elif command == 'resume':
-                    self.state['print_status'] = 'RUNNING'
-                    response = {
-                        'print': {
-                            'command': 'resume',
-                            'result': 'success',
-                            'sequence_id': sequence_id
-                        }
-                    }
-                    self._send_message(client_socket, response)
-                    
-                elif command == 'stop':
-                    # Record as failed/cancelled
-                    self._record_print_completion(success=False, reason=50331648)
-                    
-                    self.state['print_status'] = 'IDLE'
-                    self.state['progress'] = 0
-                    self.state['bed_target_temp'] = 0
-                    self.state['nozzle_target_temp'] = 0
-                    self.ams['ams']['tray_now'] = 255
-                    response = {
-                        'print': {
-                            'command': 'stop',
-                            'result': 'success',
-                            'sequence_id': sequence_id
-                        }
-                    }
-                    self._send_message(client_socket, response)
-                    
-                elif command == 'gcode_line':
-                    gcode = command_data.get('gcode', '')
-                    self._execute_gcode(gcode)
-                    response = {
-                        'print': {
-                            'command': 'gcode_line',
-                            'result': 'success',
-                            'sequence_id': sequence_id
-                        }
-                    }
-                    self._send_message(client_socket, response)
-                    
-                elif command == 'change_filament':
-                    tray_id = command_data.get('target_ams', 0)
-                    if tray_id < len(self.ams['ams']['ams'][0]['tray']):
-                        self.ams['ams']['tray_now'] = tray_id
-                        response = {
-                            'print': {
-                                'command': 'change_filament',
-                                'result': 'success',
-                                'sequence_id': sequence_id
-                            }
-                        }
-                    else:
-                        response = {
-                            'print': {
-                                'command': 'change_filament',
-                                'result': 'failed',
-                                'reason': 'Invalid tray',
-                                'sequence_id': sequence_id
-                            }
-                        }
-                    self._send_message(client_socket, response)
-                    
-                else:
-                    response = {
-                        'print': {
-                            'command': command,
-                            'result': 'unknown_command',
-                            'sequence_id': sequence_id
-                        }
-                    }
-                    self._send_message(client_socket, response)
-                
+                handler = self._cmd_handlers.get(command)
+                if handler is None:
+                    responses.append(
+                        self._ack(command, sequence_id, result='unknown_command'))
+                    continue
+                response = handler(client_socket, sequence_id, command_data)
+                if response is not None:
+                    responses.append(response)
+
+            if len(responses) == 1:
+                self._send_message(client_socket, responses[0])
+            elif responses:
+                self._send_mqtt_publish_batch(
+                    client_socket, self._report_topic_b, responses)
+
         except Exception as e:
             print(f"Command handler error: {e}")
             
     def _execute_gcode(self, gcode: str):
         """Simulate G-code execution"""
         gcode = gcode.strip().upper()
-        
-        if gcode.startswith('M104'):
-            try:
-                temp = float(gcode.split('S')[1])
-                self.state['nozzle_target_temp'] = temp
-            except:
-                pass
-                
-        elif gcode.startswith('M140'):
-            try:
-                temp = float(gcode.split('S')[1])
-                self.state['bed_target_temp'] = temp
-            except:
-                pass
-                
-        elif gcode.startswith('M106'):
+        self._mark_status_dirty()
+
+        # Single pass over the line: pull out the M-code number and the
+        # S parameter value, then dispatch on the code. Avoids the
+        # per-branch startswith/split/parse work the old ladder did.
+        if not gcode.startswith('M'):
+            return
+        n = len(gcode)
+        i = 1
+        while i < n and gcode[i].isdigit():
+            i += 1
+        if i == 1:
+            return
+        code = int(gcode[1:i])
+
+        value = None
+        s_pos = gcode.find('S', i)
+        if s_pos != -1:
+            j = s_pos + 1
+            while j < n and (gcode[j].isdigit() or gcode[j] in '.+-'):
+                j += 1
             try:
-                speed = int(gcode.split('S')[1])
-                self.state['fan_speed'] = int((speed / 255) * 100)
-            except:
-                pass
-                
-        elif gcode.startswith('M107'):
-            self.state['fan_speed'] = 0
-            
+                value = float(gcode[s_pos + 1:j])
+            except ValueError:
+                value = None
+
+        state = self.state
+        if code == 104:  # Set nozzle temperature
+            if value is not None:
+                state['nozzle_target_temp'] = value
+        elif code == 140:  # Set bed temperature
+            if value is not None:
+                state['bed_target_temp'] = value
+        elif code == 106:  # Set fan speed
+            if value is not None:
+                state['fan_speed'] = int((value / 255) * 100)
+        elif code == 107:  # Fan off
+            state['fan_speed'] = 0
+
     def _record_print_completion(self, success: bool, reason: int = 0):
         """Record a completed print in history"""
         if not hasattr(self, 'state') or 'print_start_time' not in self.state:
@@ -1089,11 +1503,14 @@ class BambuP2SSimulator:
             'thumbnail': '',
         }
         
-        self.print_history.insert(0, history_entry)
-        
-        if len(self.print_history) > 50:
-            self.print_history = self.print_history[:50]
-        
+        self.print_history.appendleft(history_entry)
+
+        # Keep the filtered views in step
+        if success:
+            self._hist_success.appendleft(history_entry)
+        else:
+            self._hist_failed.appendleft(history_entry)
+
         print(f"Recorded print completion: {history_entry['result']}")
         
     def _send_history(self, client_socket: socket.socket, sequence_id: str, command_data: Dict[str, Any]):
@@ -1103,18 +1520,18 @@ class BambuP2SSimulator:
             count = command_data.get('count', 10)
             filter_type = command_data.get('filter', 'all')
             
-            filtered_history = self.print_history.copy()
-            
+            # History is maintained newest-first, with pre-filtered views
+            # kept in step by _record_print_completion, so a query is just
+            # a slice of the right sequence
             if filter_type == 'success':
-                filtered_history = [h for h in filtered_history if h['result'] == 'success']
+                source = self._hist_success
             elif filter_type == 'failed':
-                filtered_history = [h for h in filtered_history if h['result'] == 'failed']
-            
-            filtered_history.sort(key=lambda x: x['start_time'], reverse=True)
-            
-            total_count = len(filtered_history)
-            end = min(start + count, total_count)
-            paginated_history = filtered_history[start:end]
+                source = self._hist_failed
+            else:
+                source = self.print_history
+
+            total_count = len(source)
+            paginated_history = list(itertools.islice(source, start, start + count))
             
             response = {
                 'print': {
@@ -1132,79 +1549,119 @@ class BambuP2SSimulator:
             
         except Exception as e:
             print(f"Error sending history: {e}")
-            import traceback
-            traceback.print_exc()
+            log.debug("Error sending history", exc_info=True)
             
     def _send_version(self, client_socket: socket.socket, sequence_id: str):
         """Send version information"""
-        version_info = {
-            'print': {
-                'command': 'get_version',
-                'sequence_id': sequence_id,
-                'module': [
-                    {'name': 'ota', 'sw_ver': '1.02.00.00', 'hw_ver': ''},
-                    {'name': 'mc', 'sw_ver': '1.02.00.00', 'hw_ver': 'AP04'},
-                    {'name': 'esp32', 'sw_ver': '1.02.00.00', 'hw_ver': ''},
-                    {'name': 'ams', 'sw_ver': '1.02.00.00', 'hw_ver': 'AMS01'},
-                ]
-            }
-        }
-        self._send_message(client_socket, version_info)
+        # Patch the echoed sequence_id straight into the pre-serialized
+        # template; fall back to a full serialize if the id would need
+        # JSON escaping (it is normally a short decimal string)
+        if sequence_id.isalnum():
+            payload = self._version_template.replace(
+                b'__SEQ__', sequence_id.encode('utf-8'), 1)
+        else:
+            version_info = _json_loads(self._version_template)
+            version_info['print']['sequence_id'] = sequence_id
+            payload = _json_dumps(version_info)
+        self._send_mqtt_publish(client_socket, self._report_topic_b, payload)
         
+    def _build_publish_frame(self, topic: bytes, payload: bytes) -> bytes:
+        """Assemble a complete QoS-0 PUBLISH packet as one bytes object"""
+        vh_len = 2 + len(topic) + len(payload)
+        return b"".join((
+            b"\x30",
+            _encode_varint(vh_len),
+            _U16.pack(len(topic)),
+            topic,
+            payload,
+        ))
+
+    def _send_frame(self, client: socket.socket, frame: bytes):
+        """Send one prebuilt frame, swallowing disconnect errors"""
+        try:
+            client.sendall(frame)
+        except:
+            pass
+
     def _broadcast_status(self):
         """Broadcast status to all authenticated clients"""
-        for client in list(self.authenticated_clients):
-            try:
-                self._send_full_status_mqtt(client, '0')
-            except:
-                pass
+        # All clients get identical bytes, so serialize the status and
+        # assemble the PUBLISH frame once and fan the same object out.
+        # Sends are queued on the pool rather than awaited: the tick
+        # enqueues N writes and moves on instead of blocking on each
+        # client in turn.
+        frame = self._build_publish_frame(self._report_topic_b, self._status_payload())
+        for client in self._client_snapshot:
+            self._broadcast_pool.submit(self._send_frame, client, frame)
                 
     def _simulate_printer(self):
         """Simulate printer behavior"""
-        last_update = time.time()
-        
+        stop = self._stop_event
+        next_tick = time.monotonic()
+        last_update = next_tick
+
         while self.running:
-            time.sleep(0.1)
-            current_time = time.time()
+            # Sleep exactly until the next 100 ms physics deadline; a set
+            # stop event wakes us immediately for shutdown
+            next_tick += 0.1
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                if stop.wait(timeout=delay):
+                    break
+            else:
+                # Behind schedule (slow tick); restart the cadence
+                next_tick = time.monotonic()
+            current_time = time.monotonic()
             
-            # Update temperatures
-            if self.state['nozzle_target_temp'] > 0:
-                diff = self.state['nozzle_target_temp'] - self.state['nozzle_temp']
-                self.state['nozzle_temp'] += diff * 0.05
-                
-            if self.state['bed_target_temp'] > 0:
-                diff = self.state['bed_target_temp'] - self.state['bed_temp']
-                self.state['bed_temp'] += diff * 0.03
-                
-            # Cool down when targets are 0
-            if self.state['nozzle_target_temp'] == 0:
-                self.state['nozzle_temp'] = max(25, self.state['nozzle_temp'] - 0.5)
-                
-            if self.state['bed_target_temp'] == 0:
-                self.state['bed_temp'] = max(25, self.state['bed_temp'] - 0.3)
+            state = self.state
+
+            # Temperatures approach their targets, or cool toward ambient
+            # when the target is zero; one read and one write per field
+            # instead of re-hashing the state dict for every term
+            nozzle_target = state['nozzle_target_temp']
+            if nozzle_target > 0:
+                state['nozzle_temp'] += (nozzle_target - state['nozzle_temp']) * 0.05
+            else:
+                state['nozzle_temp'] = max(25, state['nozzle_temp'] - 0.5)
+
+            bed_target = state['bed_target_temp']
+            if bed_target > 0:
+                state['bed_temp'] += (bed_target - state['bed_temp']) * 0.03
+            else:
+                state['bed_temp'] = max(25, state['bed_temp'] - 0.3)
                 
             # Update print progress
-            if self.state['print_status'] == 'RUNNING':
-                if self.state['progress'] < 100:
-                    self.state['progress'] += 10
-                    self.state['remaining_time'] = int((100 - self.state['progress']) * 36)
-                    self.state['layer_num'] = int(self.state['progress'])
+            if state['print_status'] == 'RUNNING':
+                if state['progress'] < 100:
+                    progress = state['progress'] + 10
+                    state['progress'] = progress
+                    state['remaining_time'] = int((100 - progress) * 36)
+                    state['layer_num'] = int(progress)
                     
                     # Simulate material usage
-                    if self.ams['ams']['tray_now'] != 255:
-                        tray = self.ams['ams']['ams'][0]['tray'][self.ams['ams']['tray_now']]
+                    tray_now = self.ams['ams']['tray_now']
+                    if tray_now != 255:
+                        tray = self._tray_list[tray_now]
                         if tray['remain'] > 0:
                             tray['remain'] = max(0, tray['remain'] - 0.01)
                 else:
                     # Record successful completion
                     self._record_print_completion(success=True)
 
-                    self.state['print_status'] = 'IDLE'
-                    self.state['progress'] = 100
-                    self.state['remaining_time'] = 0
+                    state['print_status'] = 'IDLE'
+                    state['progress'] = 100
+                    state['remaining_time'] = 0
                     
-            # Broadcast status every 2 seconds
-            if current_time - last_update >= 2.0:
+            # The tick above mutated temps/progress, so the serialized
+            # status needs a rebuild on next send
+            self._status_dirty = True
+
+            # Keepalive broadcast every 2 seconds; command-driven changes
+            # go out sooner, coalesced into ~200 ms windows so a burst of
+            # commands costs one fan-out instead of one per change
+            elapsed = current_time - last_update
+            if elapsed >= 2.0 or (self._pending_status and elapsed >= 0.2):
+                self._pending_status = False
                 self._broadcast_status()
                 last_update = current_time
 
@@ -1,5 +1,6 @@
 import socket
 import json
+import orjson
 import threading
 import time
 
@@ -46,9 +47,9 @@ class BambuTestClient:
                     line, buffer = buffer.split(b'\n', 1)
                     if line.strip():
                         try:
-                            message = json.loads(line.decode('utf-8'))
+                            message = orjson.loads(line)
                             self._display_message(message)
-                        except json.JSONDecodeError:
+                        except orjson.JSONDecodeError:
                             pass
                             
             except Exception as e:
@@ -1,4 +1,5 @@
 import json
+import orjson
 import paho.mqtt.client as mqtt
 import ssl
 from paho.mqtt.enums import CallbackAPIVersion
@@ -49,8 +50,8 @@ def on_connect(client, userdata, flags, reason_code, properties):
 def on_message(client, userdata, msg):
     print(f"\n--- Message received on {msg.topic} ---")
     try:
-        data = json.loads(msg.payload.decode())
-        
+        data = orjson.loads(msg.payload)
+
         # Extract key status information if available
         if 'print' in data:
             print_info = data['print']
@@ -62,7 +63,7 @@ def on_message(client, userdata, msg):
             if 'subtask_name' in print_info:
                 print(f"File: {print_info['subtask_name']}")
         
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print("Received non-JSON message")
         print(msg.payload.decode())
 